@@ -1,115 +1,358 @@
 import os
-import uuid
-import time
-import json
+import asyncio
+import hashlib
+import queue
+import secrets
 import sqlite3
-import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 import streamlit as st
-import pandas as pd
-import openai
+from openai import AsyncOpenAI
+try:
+    import orjson
+except ImportError:  # optional: stdlib json produces the same compact TEXT, just slower
+    import json
+    orjson = None
 
 # --------------------------- database helpers (sqlite) ---------------------------- #
 DB_PATH = os.path.join(os.environ.get("DATA_DIR", "."), "polls.db")
+SQLITE_PRAGMAS = ("journal_mode=WAL", "synchronous=NORMAL", "temp_store=MEMORY", "cache_size=-16384", "mmap_size=268435456", "foreign_keys=ON")
+POLLS_PAGE_SIZE = 50
 
+@st.cache_resource
+def _conn_pool() -> queue.SimpleQueue:
+    # cached so idle connections survive script reruns, which Streamlit runs on fresh threads
+    return queue.SimpleQueue()
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(f"PRAGMA {pragma}")
+    return conn
+
+@contextmanager
+def pooled_conn() -> Iterator[sqlite3.Connection]:
+    # borrow an idle connection (opening one only when all are busy); WAL lets them read concurrently
+    # while BEGIN IMMEDIATE serialises writers
+    pool = _conn_pool()
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _connect()
+    try:
+        yield conn
+    finally:
+        # a connection left inside a transaction (or closed by _end_transaction) would break the next
+        # borrower's BEGIN IMMEDIATE, so it is dropped instead of re-queued
+        if _reusable(conn): pool.put(conn)
+        else: conn.close()
+
+def _reusable(conn: sqlite3.Connection) -> bool:
+    try:
+        return not conn.in_transaction
+    except sqlite3.ProgrammingError:  # already closed
+        return False
+
+def _end_transaction(conn: sqlite3.Connection, statement: str):
+    try:
+        conn.execute(statement)
+    except BaseException:
+        conn.close()  # COMMIT/ROLLBACK failed, so the connection's state is unknown; never reuse it
+        raise
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    with pooled_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            _end_transaction(conn, "ROLLBACK")
+            raise
+        _end_transaction(conn, "COMMIT")
+
+def _dumps(obj: Any) -> str:
+    # kept as TEXT rather than BLOB so the json_extract() queries can still read it
+    return orjson.dumps(obj).decode() if orjson else json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+_loads = orjson.loads if orjson else json.loads
+
+# statements live in constants so the identical string hits sqlite3's per-connection statement cache on every call
+_SQL_INSERT_POLL = "INSERT INTO polls (id, poll_type, question, options, slack_text, created_at) VALUES (?, ?, ?, ?, ?, strftime('%s', 'now')) RETURNING created_at"
+_SQL_INSERT_VOTE = "INSERT INTO votes (poll_id, ts, vote_data, option_index, voter_name, ranking) VALUES (?, strftime('%s', 'now'), ?, ?, ?, ?)"
+_SQL_VOTER_EXISTS = "SELECT 1 FROM votes WHERE poll_id = ? AND voter_name = ? LIMIT 1"
+_SQL_VOTER_NAMES = "SELECT voter_name FROM votes WHERE poll_id = ?"
+_SQL_END_POLL = "UPDATE polls SET closed = 1 WHERE id = ?"
+_SQL_UPDATE_SUMMARY = "UPDATE polls SET summary = ? WHERE id = ?"
+_SQL_DELETE_VOTES = "DELETE FROM votes WHERE poll_id = ?"
+_SQL_DELETE_POLL = "DELETE FROM polls WHERE id = ?"
+_SQL_DELETE_TOTALS = "DELETE FROM poll_totals WHERE poll_id = ?"
+_POLL_COLUMNS = "id, poll_type, question, options, created_at, closed, summary, slack_text"
+_SQL_SELECT_POLL = f"SELECT {_POLL_COLUMNS} FROM polls WHERE id = ?"
+_SQL_SELECT_POLL_META = "SELECT poll_type, closed FROM polls WHERE id = ?"
+# one statement for the whole dashboard list: vote counts come off the (poll_id, voter_name) index and
+# single-choice totals are packed as [[option_index, count], ...] from poll_totals
+_POLL_LIST_SELECT = (
+    f"SELECT {_POLL_COLUMNS}, "
+    "(SELECT COUNT(*) FROM votes WHERE votes.poll_id = polls.id) AS vote_count, "
+    "CASE WHEN poll_type = 'single_choice' THEN "
+    "(SELECT json_group_array(json_array(option_index, count)) FROM poll_totals WHERE poll_totals.poll_id = polls.id) "
+    "END AS totals "
+    "FROM polls "
+)
+# id breaks created_at ties so pages never overlap; rows still stream off idx_polls_created_at and only ties get sorted
+_SQL_LIST_POLLS = _POLL_LIST_SELECT + "ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
+_SQL_LIST_PENDING_SUMMARIES = _POLL_LIST_SELECT + "WHERE closed = 1 AND (summary IS NULL OR summary = '') ORDER BY created_at DESC, id DESC"
+_SQL_SELECT_SUMMARY_CACHE = "SELECT key, summary FROM summary_cache WHERE key IN (SELECT value FROM json_each(?))"
+_SQL_INSERT_SUMMARY_CACHE = "INSERT OR REPLACE INTO summary_cache (key, summary, created_at) VALUES (?, ?, strftime('%s', 'now'))"
+# SQLite stitches one poll's votes into a single JSON array so Python decodes it in one call;
+# ranked votes are rebuilt from their name/ranking columns instead of the full vote_data payload
+_VOTE_JSON = "CASE WHEN ranking IS NOT NULL THEN json_object('name', voter_name, 'ranking', json(ranking)) ELSE vote_data END"
+_SQL_VOTES_FOR_POLL = (
+    "SELECT '[' || group_concat(vote, ',') || ']' FROM ("
+    f"SELECT {_VOTE_JSON} AS vote FROM votes WHERE poll_id = ? ORDER BY id)"
+)
+# the same array per poll for a JSON list of poll ids, in one statement
+_SQL_VOTES_FOR_POLLS = (
+    "SELECT poll_id, '[' || group_concat(vote, ',') || ']' FROM ("
+    f"SELECT poll_id, {_VOTE_JSON} AS vote FROM votes WHERE poll_id IN (SELECT value FROM json_each(?)) ORDER BY poll_id, id) "
+    "GROUP BY poll_id"
+)
+# matrix aggregates per (item, criterion): json_each flattens each vote's responses inside SQLite;
+# counts use CASE so unanswered (null) responses count 0 rather than turning the SUM into NULL
+_SQL_MATRIX_CELLS = (
+    "SELECT item.key, crit.key, SUM(CASE WHEN crit.value = 'Yes' THEN 1 ELSE 0 END), "
+    "SUM(CASE WHEN crit.value = 'No' THEN 1 ELSE 0 END), "
+    "AVG(CASE WHEN crit.type IN ('integer', 'real') THEN crit.value END), "
+    "SUM(CASE WHEN crit.type = 'text' AND trim(crit.value) <> '' THEN 1 ELSE 0 END) "
+    "FROM votes, json_each(votes.vote_data, '$.responses') AS item, json_each(item.value) AS crit "
+    "WHERE votes.poll_id = ? AND item.type = 'object' GROUP BY item.key, crit.key"
+)
+# Borda points per choice: json_each over the stored ranking gives (position, choice) pairs
+_SQL_BORDA_SCORES = (
+    "SELECT r.value, SUM(? - r.key) FROM votes, json_each(votes.ranking) AS r "
+    "WHERE votes.poll_id = ? AND votes.ranking IS NOT NULL GROUP BY r.value"
+)
+
+# polls is keyed by a short text id, so WITHOUT ROWID stores rows in the primary-key b-tree itself;
+# every poll lookup is then a single b-tree descent. Only applies to newly created databases.
+_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS polls (
+        id TEXT PRIMARY KEY, poll_type TEXT NOT NULL, question TEXT NOT NULL,
+        options TEXT NOT NULL, created_at INTEGER NOT NULL,
+        closed INTEGER NOT NULL DEFAULT 0, summary TEXT, slack_text TEXT
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS votes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, poll_id TEXT NOT NULL, ts INTEGER NOT NULL,
+        vote_data TEXT NOT NULL, option_index INTEGER, voter_name TEXT, ranking TEXT,
+        FOREIGN KEY (poll_id) REFERENCES polls (id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_polls_created_at ON polls(created_at DESC);
+    CREATE TABLE IF NOT EXISTS summary_cache (
+        key TEXT PRIMARY KEY, summary TEXT NOT NULL, created_at INTEGER NOT NULL
+    ) WITHOUT ROWID;
+'''
+
+COLUMN_MIGRATIONS = [
+    ("polls", "slack_text", "TEXT", None),
+    ("votes", "option_index", "INTEGER", "UPDATE votes SET option_index = json_extract(vote_data, '$.option_index') WHERE json_type(vote_data, '$.option_index') = 'integer'"),
+    ("votes", "voter_name", "TEXT", "UPDATE votes SET voter_name = json_extract(vote_data, '$.name')"),
+    ("votes", "ranking", "TEXT", "UPDATE votes SET ranking = json_extract(vote_data, '$.ranking')"),
+]
+
+def _invalidate_vote_cache():
+    # a new vote only changes counts and results; the poll row itself (get_poll) and the
+    # closed-and-unsummarised list are untouched, since closed polls take no votes
+    list_polls_meta.clear()
+    get_votes.clear()
+    get_borda_scores.clear()
+    get_matrix_cells.clear()
+
+def _invalidate_poll_cache():
+    # reads are served from st.cache_data; every write drops them so the next rerun sees fresh data
+    get_poll.clear()
+    list_pending_summaries.clear()
+    _invalidate_vote_cache()
+
+@st.cache_resource
 def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS polls (
-                id TEXT PRIMARY KEY, poll_type TEXT NOT NULL, question TEXT NOT NULL,
-                options TEXT NOT NULL, created_at INTEGER NOT NULL,
-                closed INTEGER NOT NULL DEFAULT 0, summary TEXT
-            );
+    # cache_resource runs this once per process and makes concurrent first sessions wait for it
+    with pooled_conn() as conn:
+        conn.executescript(_SCHEMA)
+    with transaction() as conn:
+        # databases created before these columns existed: add them and backfill where possible
+        existing = {(table, row["name"]) for table in ("polls", "votes") for row in conn.execute(f"PRAGMA table_info({table})")}
+        for table, column, decl, backfill in COLUMN_MIGRATIONS:
+            if (table, column) not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+                if backfill: conn.execute(backfill)
+        # (poll_id, voter_name) makes the duplicate-voter check one probe and still serves plain poll_id lookups
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_votes_poll_voter ON votes(poll_id, voter_name)")
+        conn.execute("DROP INDEX IF EXISTS idx_votes_poll_id")
+        # running single-choice tallies, kept current by a trigger so the dashboard never rescans votes
+        has_totals = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'poll_totals'").fetchone()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS poll_totals (
+                poll_id TEXT NOT NULL, option_index INTEGER NOT NULL, count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (poll_id, option_index)
+            ) WITHOUT ROWID;
         ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS votes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, poll_id TEXT NOT NULL, ts INTEGER NOT NULL,
-                vote_data TEXT NOT NULL, FOREIGN KEY (poll_id) REFERENCES polls (id)
-            );
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_votes_totals AFTER INSERT ON votes WHEN NEW.option_index IS NOT NULL
+            BEGIN
+                INSERT INTO poll_totals (poll_id, option_index, count) VALUES (NEW.poll_id, NEW.option_index, 1)
+                ON CONFLICT (poll_id, option_index) DO UPDATE SET count = count + 1;
+            END;
         ''')
-        conn.commit()
-
-def create_poll(poll_type: str, question: str, options: Dict) -> str:
-    pid = uuid.uuid4().hex[:10]
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.cursor().execute(
-            "INSERT INTO polls (id, poll_type, question, options, created_at) VALUES (?, ?, ?, ?, ?)",
-            (pid, poll_type, question, json.dumps(options), int(time.time()))
-        )
-        conn.commit()
-    return pid
-
-def cast_vote(poll_id: str, vote_data: Dict, poll_data: Dict) -> bool:
-    if not poll_data or poll_data["closed"]: return False
-    if poll_data["poll_type"] != "single_choice":
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT vote_data FROM votes WHERE poll_id = ?", (poll_id,))
-            if any(json.loads(row[0]).get("name") == vote_data.get("name") for row in cursor.fetchall()):
-                return False
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.cursor().execute(
-            "INSERT INTO votes (poll_id, ts, vote_data) VALUES (?, ?, ?)",
-            (poll_id, int(time.time()), json.dumps(vote_data))
-        )
-        conn.commit()
+        if not has_totals:
+            conn.execute(
+                "INSERT INTO poll_totals (poll_id, option_index, count) "
+                "SELECT poll_id, option_index, COUNT(*) FROM votes WHERE option_index IS NOT NULL GROUP BY poll_id, option_index"
+            )
+
+def create_poll(poll_type: str, question: str, options: Dict, base_url: str) -> Dict[str, Any]:
+    pid = secrets.token_urlsafe(6)
+    slack_text = build_slack_text(base_url, pid, question, poll_type)
+    with transaction() as conn:
+        created_at = conn.execute(_SQL_INSERT_POLL, (pid, poll_type, question, _dumps(options), slack_text)).fetchone()[0]
+    _invalidate_poll_cache()
+    return {"id": pid, "poll_type": poll_type, "question": question, "options": options,
+            "created_at": created_at, "closed": 0, "summary": None, "slack_text": slack_text}
+
+def _vote_row(poll_id: str, vote_data: Dict) -> tuple:
+    opt_idx, ranking = vote_data.get("option_index"), vote_data.get("ranking")
+    return (poll_id, _dumps(vote_data), opt_idx if isinstance(opt_idx, int) else None,
+            vote_data.get("name"), _dumps(ranking) if ranking is not None else None)
+
+def cast_vote(poll_id: str, vote_data: Dict) -> bool:
+    row = _vote_row(poll_id, vote_data)
+    # validation and insert share one BEGIN IMMEDIATE transaction, so two submissions under the
+    # same name can't both pass the duplicate check
+    with transaction() as conn:
+        meta = conn.execute(_SQL_SELECT_POLL_META, (poll_id,)).fetchone()
+        if not meta or meta["closed"]: return False
+        if meta["poll_type"] != "single_choice" and conn.execute(_SQL_VOTER_EXISTS, (poll_id, vote_data.get("name"))).fetchone():
+            return False
+        conn.execute(_SQL_INSERT_VOTE, row)
+    _invalidate_vote_cache()
     return True
 
+def cast_votes_bulk(poll_id: str, votes: List[Dict]) -> int:
+    # e.g. an import: one transaction and one executemany, with the same rules as cast_vote; returns how many were stored
+    with transaction() as conn:
+        meta = conn.execute(_SQL_SELECT_POLL_META, (poll_id,)).fetchone()
+        if not meta or meta["closed"]: return 0
+        if meta["poll_type"] != "single_choice":
+            seen = {row[0] for row in conn.execute(_SQL_VOTER_NAMES, (poll_id,))}
+            fresh = []
+            for vote_data in votes:
+                if vote_data.get("name") not in seen:
+                    seen.add(vote_data.get("name")); fresh.append(vote_data)
+            votes = fresh
+        conn.executemany(_SQL_INSERT_VOTE, [_vote_row(poll_id, vote_data) for vote_data in votes])
+    if votes: _invalidate_vote_cache()
+    return len(votes)
+
 def end_poll(poll_id: str):
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.cursor().execute("UPDATE polls SET closed = 1 WHERE id = ?", (poll_id,))
-        conn.commit()
+    with transaction() as conn:
+        conn.execute(_SQL_END_POLL, (poll_id,))
+    _invalidate_poll_cache()
 
 def delete_poll(poll_id: str):
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM votes WHERE poll_id = ?", (poll_id,))
-        cursor.execute("DELETE FROM polls WHERE id = ?", (poll_id,))
-        conn.commit()
+    with transaction() as conn:
+        conn.execute(_SQL_DELETE_VOTES, (poll_id,))
+        conn.execute(_SQL_DELETE_TOTALS, (poll_id,))
+        conn.execute(_SQL_DELETE_POLL, (poll_id,))
+    _invalidate_poll_cache()
 
+@st.cache_data(ttl=30)
 def get_poll(poll_id: str) -> Dict[str, Any] | None:
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        poll_row = conn.cursor().execute("SELECT * FROM polls WHERE id = ?", (poll_id,)).fetchone()
-        if not poll_row: return None
-        poll = dict(poll_row)
-        poll["options"] = json.loads(poll["options"])
-        return poll
-
-def list_polls() -> List[Dict[str, Any]]:
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        polls = [dict(row) for row in conn.cursor().execute("SELECT * FROM polls ORDER BY created_at DESC").fetchall()]
-        for poll in polls:
-            poll["options"] = json.loads(poll["options"])
-            votes_rows = conn.cursor().execute("SELECT vote_data FROM votes WHERE poll_id = ?", (poll["id"],)).fetchall()
-            poll["votes_log"] = [json.loads(v[0]) for v in votes_rows]
-            if poll["poll_type"] == "single_choice":
-                poll["totals"] = [0] * len(poll["options"]["choices"])
-                for vote in poll["votes_log"]:
-                    opt_idx = vote.get("option_index")
-                    if isinstance(opt_idx, int) and 0 <= opt_idx < len(poll["totals"]):
-                        poll["totals"][opt_idx] += 1
+    with pooled_conn() as conn:
+        poll_row = conn.execute(_SQL_SELECT_POLL, (poll_id,)).fetchone()
+    if not poll_row: return None
+    poll = dict(poll_row)
+    poll["options"] = _loads(poll["options"])
+    return poll
+
+def _read_poll_list(sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+    # everything the dashboard shows without opening a poll's results; individual votes come from get_votes()
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.row_factory = None  # plain tuples: every column is unpacked positionally below
+        rows = cur.execute(sql, params).fetchall()
+    polls = []
+    for pid, poll_type, question, options, created_at, closed, summary, slack_text, vote_count, packed_totals in rows:
+        poll = {"id": pid, "poll_type": poll_type, "question": question, "options": _loads(options), "created_at": created_at,
+                "closed": closed, "summary": summary, "slack_text": slack_text, "vote_count": vote_count}
+        if poll_type == "single_choice":
+            poll["totals"] = [0] * len(poll["options"]["choices"])
+            for opt_idx, cnt in _loads(packed_totals):
+                if 0 <= opt_idx < len(poll["totals"]):
+                    poll["totals"][opt_idx] += cnt
+        polls.append(poll)
     return polls
 
+@st.cache_data(ttl=30)
+def list_polls_meta(limit: int = POLLS_PAGE_SIZE, offset: int = 0) -> List[Dict[str, Any]]:
+    return _read_poll_list(_SQL_LIST_POLLS, (limit, offset))
+
+@st.cache_data(ttl=30)
+def list_pending_summaries() -> List[Dict[str, Any]]:
+    # closed polls still waiting for an AI summary, across every page
+    return _read_poll_list(_SQL_LIST_PENDING_SUMMARIES)
+
+@st.cache_data(ttl=30)
+def get_votes(poll_id: str) -> List[Dict[str, Any]]:
+    with pooled_conn() as conn:
+        votes_json = conn.execute(_SQL_VOTES_FOR_POLL, (poll_id,)).fetchone()[0]
+    return _loads(votes_json) if votes_json else []
+
+def get_votes_for_polls(poll_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    # bulk variant of get_votes for batch work such as summarising every closed poll
+    with pooled_conn() as conn:
+        rows = conn.execute(_SQL_VOTES_FOR_POLLS, (_dumps(poll_ids),)).fetchall()
+    return {poll_id: _loads(votes_json) for poll_id, votes_json in rows}
+
+@st.cache_data(ttl=30)
+def get_borda_scores(poll_id: str, choices: List[str]) -> Dict[str, int]:
+    scores = {choice: 0 for choice in choices}
+    with pooled_conn() as conn:
+        for choice, points in conn.execute(_SQL_BORDA_SCORES, (len(choices), poll_id)):
+            if choice in scores: scores[choice] = points
+    return scores
+
+@st.cache_data(ttl=30)
+def get_matrix_cells(poll_id: str) -> Dict[tuple, tuple]:
+    # (item, label) -> (yes, no, numeric average, non-empty text count)
+    with pooled_conn() as conn:
+        rows = conn.execute(_SQL_MATRIX_CELLS, (poll_id,)).fetchall()
+    return {(row[0], row[1]): tuple(row[2:]) for row in rows}
+
 def update_summary(poll_id: str, summary: str):
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.cursor().execute("UPDATE polls SET summary = ? WHERE id = ?", (summary, poll_id))
-        conn.commit()
+    with transaction() as conn:
+        conn.execute(_SQL_UPDATE_SUMMARY, (summary, poll_id))
+    _invalidate_poll_cache()
 
 # ----------------------------- AI Summary & Slack Integration -------------------------------- #
-def generate_summary(poll_data: dict, api_key: str):
-    openai.api_key = api_key
+SUMMARY_MODEL = "gpt-4o-mini"
+
+def build_summary_prompt(poll_data: dict) -> str:
     results = ""
     # Create a string representation of the results for the prompt
     if poll_data['poll_type'] == 'single_choice':
         results = "\n".join([f"- '{opt}': {count} votes" for opt, count in zip(poll_data['options']['choices'], poll_data['totals'])])
-    elif poll_data['poll_type'] in ['ranked_preference', 'matrix']:
-        results = json.dumps(poll_data['votes_log'], indent=2)
+    elif poll_data['poll_type'] == 'ranked_preference':
+        # one line per voter, first choice first; far fewer tokens than a JSON dump
+        results = "\n".join([f"- {v['name']}: {' > '.join(v.get('ranking', []))}" for v in poll_data['votes_log']])
+    elif poll_data['poll_type'] == 'matrix':
+        results = _dumps(poll_data['votes_log'])
 
     prompt = f"""
     You are a helpful assistant analyzing poll results for a team. Your task is to provide a clear summary and insightful analysis based ONLY on the provided poll data. Do not invent facts or numbers.
@@ -131,32 +374,103 @@ def generate_summary(poll_data: dict, api_key: str):
     Here is the data:
     **Poll Question:** {poll_data['question']}
     **Poll Type:** {poll_data['poll_type']}
-    **Total Votes Cast:** {len(poll_data['votes_log'])}
+    **Total Votes Cast:** {poll_data['vote_count']}
     **Results Data:**
     {results}
     """
+    return prompt
+
+SUMMARY_CONCURRENCY = 4  # OpenAI requests in flight at once per batch
+
+async def request_summary(client: AsyncOpenAI, prompt: str) -> tuple:
+    # (summary, ok); failures come back as a message so one bad request doesn't sink the batch
     try:
-        response = openai.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": prompt}], temperature=0.2)
-        return response.choices[0].message.content
+        response = await client.chat.completions.create(model=SUMMARY_MODEL, messages=[{"role": "user", "content": prompt}], temperature=0.2)
+        return response.choices[0].message.content, True
     except Exception as e:
-        return f"Error generating summary: {e}"
+        return f"Error generating summary: {e}", False
+
+def generate_summaries(polls: List[dict], api_key: str) -> List[str]:
+    # the prompt carries the question and full results, so identical poll states reuse a stored summary;
+    # all SQLite work happens here, before and after the event loop, so only API calls are awaited
+    keys = []
+    prompts: Dict[str, str] = {}
+    for poll_data in polls:
+        prompt = build_summary_prompt(poll_data)
+        key = hashlib.blake2b(f"{SUMMARY_MODEL}|{prompt}".encode(), digest_size=16).hexdigest()
+        keys.append(key); prompts[key] = prompt
+    with pooled_conn() as conn:
+        summaries = dict(conn.execute(_SQL_SELECT_SUMMARY_CACHE, (_dumps(list(prompts)),)).fetchall())
+    missing = [key for key in prompts if key not in summaries]
+
+    async def run():
+        # one client per batch so every request shares its connection pool; the semaphore caps requests in flight
+        limit = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+        async with AsyncOpenAI(api_key=api_key) as client:
+            async def bounded(prompt: str) -> tuple:
+                async with limit:
+                    return await request_summary(client, prompt)
+            return await asyncio.gather(*(bounded(prompts[key]) for key in missing))
+    results = asyncio.run(run()) if missing else []
+    fresh = [(key, summary) for key, (summary, ok) in zip(missing, results) if ok]
+    if fresh:
+        with transaction() as conn:
+            conn.executemany(_SQL_INSERT_SUMMARY_CACHE, fresh)
+    summaries.update((key, summary) for key, (summary, _) in zip(missing, results))
+    return [summaries[key] for key in keys]
+
+SLACK_TIMEOUT = (3, 10)  # (connect, read) seconds
+
+@st.cache_resource
+def slack_session() -> requests.Session:
+    # kept alive across reruns so repeated posts reuse the pooled TLS connection to Slack
+    session = requests.Session()
+    session.headers["Content-Type"] = "application/json"
+    # room for the background Slack workers plus script threads posting summaries; webhooks are POSTs, so only
+    # retry failures where Slack cannot have accepted the message (connect errors, rate limiting, unavailable)
+    retry = Retry(total=2, connect=2, read=0, status=2, backoff_factor=0.2, status_forcelist=(429, 503),
+                  allowed_methods=frozenset({"POST"}), raise_on_status=False)
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry))
+    return session
+
+@st.cache_resource
+def slack_executor() -> ThreadPoolExecutor:
+    # Slack posts that the UI does not need to wait for run here instead of on the script thread
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="slack")
+
+def _post_to_slack(webhook_url: str, payload: Dict[str, Any]) -> requests.Response:
+    return slack_session().post(webhook_url, data=orjson.dumps(payload) if orjson else _dumps(payload).encode(), timeout=SLACK_TIMEOUT)
 
 def send_summary_to_slack(webhook_url: str, poll_data: Dict):
     text = f"📊 *Poll Closed: Summary for \"{poll_data['question']}\"*\n\n{poll_data['summary']}"
-    payload = {"text": text}
-    return requests.post(webhook_url, json=payload, timeout=10)
+    return _post_to_slack(webhook_url, {"text": text})
 
 # ----------------------------- UI & Slack Helpers -------------------------------- #
-def post_poll_to_slack(webhook_url: str, base_url: str, poll_id: str, poll_data: Dict[str, Any]):
-    question, poll_type = poll_data["question"], poll_data["poll_type"]
-    params = urllib.parse.urlencode({'poll': poll_id})
-    vote_url = f"{base_url}?{params}"
+def build_slack_text(base_url: str, poll_id: str, question: str, poll_type: str) -> str:
+    # poll ids are base64url, so they never need quoting
+    vote_url = f"{base_url}?poll={poll_id}"
     
     title = poll_type.replace('_', ' ').title()
     icon = {"single_choice": "bar_chart", "ranked_preference": "ballot_box_with_ballot", "matrix": "clipboard"}.get(poll_type, "bar_chart")
     lines = [f":{icon}: *{title} Poll:* {question}", "", f"<{vote_url}|Click Here to Vote>"]
-    
-    return requests.post(webhook_url, json={"text": "\n".join(lines)}, timeout=10)
+    return "\n".join(lines)
+
+def post_poll_to_slack(webhook_url: str, poll_data: Dict[str, Any]):
+    # the message is rendered once by create_poll and stored with the poll
+    return _post_to_slack(webhook_url, {"text": poll_data["slack_text"]})
+
+def report_slack_posts():
+    # background posts started by this session; each outcome is shown once, on the first rerun after it finishes
+    posts = st.session_state.get("slack_posts", {})
+    for pid, (question, future) in list(posts.items()):
+        if not future.done(): continue
+        del posts[pid]
+        try:
+            resp = future.result()
+        except requests.RequestException as e:
+            st.error(f"Failed to post \"{question}\" to Slack: {e}"); continue
+        if resp.ok: st.success(f"\"{question}\" posted to Slack!")
+        else: st.error(f"Failed to post \"{question}\" to Slack: {resp.text}")
 
 def render_vote_page(poll_data: dict):
     st.title("🗳️ Slack Poll")
@@ -166,6 +480,11 @@ def render_vote_page(poll_data: dict):
         return
 
     current_poll_id = st.query_params.get("poll")
+    # once this session has voted, later reruns skip the form and never reach the database
+    voted_key = f"voted_{current_poll_id}"
+    if st.session_state.get(voted_key):
+        st.success("✅ Thank you, your response has been recorded!")
+        return
     
     with st.form(key="vote_form"):
         vote_data = {}
@@ -203,7 +522,8 @@ def render_vote_page(poll_data: dict):
         
         submitted = st.form_submit_button("Submit")
         if submitted:
-            if cast_vote(current_poll_id, vote_data, poll_data):
+            if cast_vote(current_poll_id, vote_data):
+                st.session_state[voted_key] = True
                 st.success("✅ Thank you, your response has been recorded!")
             else:
                 st.error("⚠️ Could not record vote. You may have already voted or the poll is closed.")
@@ -221,35 +541,32 @@ def display_single_choice_results(poll):
         st.markdown(f"**{choice}** ({totals[i]} votes)")
         st.progress(int(percentage))
 
-def display_ranked_results(poll):
-    choices, votes = poll["options"]["choices"], poll["votes_log"]
-    num_choices = len(choices)
-    scores = {choice: 0 for choice in choices}
-    for vote in votes:
-        for i, choice in enumerate(vote.get("ranking", [])):
-            if choice in scores: scores[choice] += (num_choices - i)
+def display_ranked_results(poll, votes):
+    import pandas as pd  # deferred: vote pages and single-choice results never need it
+    scores = get_borda_scores(poll["id"], poll["options"]["choices"])
     df = pd.DataFrame(sorted(scores.items(), key=lambda item: item[1], reverse=True), columns=["Option", "Score"]).set_index("Option")
     st.success(f"**Winner (by weighted score): {df.index[0]}**")
     col1, col2 = st.columns([1, 2]); col1.dataframe(df); col2.bar_chart(df)
     with st.expander("View individual votes"):
-        st.dataframe(pd.DataFrame([{"Voter": v["name"], **{f"Rank #{i+1}": r for i, r in enumerate(v.get("ranking", []))}} for v in votes]), use_container_width=True, hide_index=True)
+        rankings = [v.get("ranking", []) for v in votes]
+        depth = max(map(len, rankings), default=0)
+        columns = {"Voter": [v["name"] for v in votes], **{f"Rank #{i+1}": [r[i] if i < len(r) else None for r in rankings] for i in range(depth)}}
+        st.dataframe(columns, use_container_width=True, hide_index=True)
 
-def display_matrix_results(poll):
-    items, criteria, votes = poll["options"]["items"], poll["options"]["criteria"], poll["votes_log"]
+def display_matrix_results(poll, votes):
+    import pandas as pd
+    items, criteria = poll["options"]["items"], poll["options"]["criteria"]
     summary_data = {crit["label"]: [] for crit in criteria}
+    cells = get_matrix_cells(poll["id"])
     for item in items:
         for crit in criteria:
             label, type = crit["label"], crit.get("type", "Yes/No")
-            responses = [v["responses"].get(item, {}).get(label) for v in votes if v["responses"].get(item)]
+            yes_count, no_count, avg_score, text_count = cells.get((item, label), (0, 0, None, 0))
             if type == "Yes/No":
-                yes_count = responses.count("Yes"); total = responses.count("Yes") + responses.count("No")
+                total = yes_count + no_count
                 summary_data[label].append(yes_count / total if total > 0 else 0)
-            elif type == "Scale (1-5)":
-                numeric_responses = [r for r in responses if isinstance(r, (int, float))]
-                avg_score = sum(numeric_responses) / len(numeric_responses) if numeric_responses else 0
-                summary_data[label].append(avg_score)
-            else:
-                text_count = len([r for r in responses if r and str(r).strip()]); summary_data[label].append(text_count)
+            elif type == "Scale (1-5)": summary_data[label].append(avg_score or 0)
+            else: summary_data[label].append(text_count)
     df = pd.DataFrame(summary_data, index=items)
     st.subheader("Aggregated Results")
     styled_df = df.style.background_gradient(cmap='viridis', vmin=0, vmax=5, subset=[c["label"] for c in criteria if c.get("type") == "Scale (1-5)"]) \
@@ -258,10 +575,48 @@ def display_matrix_results(poll):
                          .format("{:.0%}", subset=[c["label"] for c in criteria if c.get("type") == "Yes/No"])
     st.dataframe(styled_df, use_container_width=True)
     with st.expander("View individual text responses"):
-        for crit in criteria:
-            if crit.get("type") in ["Text", "Custom Select"]:
-                st.subheader(f"Responses for: {crit['label']}")
-                for vote in votes: st.markdown(f"- **{vote['name']}**: {vote['responses'].get(items[0], {}).get(crit['label'])}")
+        text_cols = [(item, c["label"], f"{item} - {c['label']}") for item in items for c in criteria if c.get("type") in ["Text", "Custom Select"]]
+        columns = {"Voter": [], **{col: [] for _, _, col in text_cols}}
+        for vote in votes:
+            columns["Voter"].append(vote["name"])
+            for item, label, col in text_cols: columns[col].append(vote["responses"].get(item, {}).get(label))
+        st.dataframe(columns, use_container_width=True, hide_index=True)
+
+@st.fragment
+def render_create_poll(webhook_url: str, base_url: str):
+    # a fragment: typing a question or options reruns only this sidebar block, not the whole dashboard
+    st.subheader("Create a New Poll")
+    poll_type = st.radio("Poll Type", ["Single Choice", "Ranked Preference", "Matrix"])
+    question = st.text_input("Poll Question", key="poll_question")
+    options_data = {}
+    if poll_type in ["Single Choice", "Ranked Preference"]:
+        if "choices" not in st.session_state: st.session_state.choices = ["", ""]
+        for i, choice in enumerate(st.session_state.choices): st.session_state.choices[i] = st.text_input(f"Option {i+1}", choice, key=f"choice_{i}")
+        c1, c2 = st.columns(2); c1.button("Add Option", on_click=lambda: st.session_state.choices.append("")); c2.button("Remove Last Option", on_click=lambda: st.session_state.choices.pop())
+        options_data["choices"] = [c.strip() for c in st.session_state.choices if c.strip()]
+    elif poll_type == "Matrix":
+        if "matrix_items" not in st.session_state: st.session_state.matrix_items = ["Topic A"]
+        if "matrix_criteria" not in st.session_state: st.session_state.matrix_criteria = [{"label": "Wider TAM?", "type": "Yes/No", "options": ""}]
+        st.write("**Topics to Rate**")
+        for i, item in enumerate(st.session_state.matrix_items): st.session_state.matrix_items[i] = st.text_input(f"Topic {i+1}", item, key=f"item_{i}")
+        c1, c2 = st.columns(2); c1.button("Add Topic", on_click=lambda: st.session_state.matrix_items.append("")); c2.button("Remove Last Topic", on_click=lambda: st.session_state.matrix_items.pop())
+        st.write("**Criteria**")
+        for i, crit in enumerate(st.session_state.matrix_criteria):
+            c1, c2 = st.columns([2, 1])
+            crit["label"] = c1.text_input(f"Criterion {i+1}", crit["label"], key=f"crit_label_{i}")
+            crit["type"] = c2.selectbox("Type", ["Yes/No", "Scale (1-5)", "Text", "Custom Select"], key=f"crit_type_{i}", index=["Yes/No", "Scale (1-5)", "Text", "Custom Select"].index(crit.get("type", "Yes/No")))
+            if crit["type"] == "Custom Select": crit["options"] = st.text_input("Options (comma-separated)", crit.get("options", ""), key=f"crit_opts_{i}")
+        c1, c2 = st.columns(2); c1.button("Add Criterion", on_click=lambda: st.session_state.matrix_criteria.append({"label": "", "type": "Yes/No", "options": ""})); c2.button("Remove Last Criterion", on_click=lambda: st.session_state.matrix_criteria.pop())
+        options_data["items"] = [i.strip() for i in st.session_state.matrix_items if i.strip()]
+        options_data["criteria"] = [{"label": c["label"].strip(), "type": c["type"], "options": [o.strip() for o in c.get("options", "").split(',') if o.strip()]} for c in st.session_state.matrix_criteria if c["label"].strip()]
+    if st.button("Create & Post", type="primary", disabled=not all([webhook_url, base_url, question, options_data])):
+        poll = create_poll(poll_type.lower().replace(" ", "_"), question, options_data, base_url)
+        future = slack_executor().submit(post_poll_to_slack, webhook_url, poll)
+        st.session_state.setdefault("slack_posts", {})[poll["id"]] = (question, future)
+        st.session_state.poll_created = True
+        st.rerun()  # whole-app rerun so the new poll shows up in the list
+    if st.session_state.pop("poll_created", False): st.success("Poll created! Posting to Slack...")
+    report_slack_posts()
 
 def render_dashboard():
     st.title("📊 Slack Polls Dashboard")
@@ -272,46 +627,38 @@ def render_dashboard():
         if webhook_url and base_url: st.success("✅ Config loaded.")
         else: st.error("🚨 Config missing in secrets.toml!")
         st.markdown("---")
-        st.subheader("Create a New Poll")
-        poll_type = st.radio("Poll Type", ["Single Choice", "Ranked Preference", "Matrix"])
-        question = st.text_input("Poll Question", key="poll_question")
-        options_data = {}
-        if poll_type in ["Single Choice", "Ranked Preference"]:
-            if "choices" not in st.session_state: st.session_state.choices = ["", ""]
-            for i, choice in enumerate(st.session_state.choices): st.session_state.choices[i] = st.text_input(f"Option {i+1}", choice, key=f"choice_{i}")
-            c1, c2 = st.columns(2); c1.button("Add Option", on_click=lambda: st.session_state.choices.append("")); c2.button("Remove Last Option", on_click=lambda: st.session_state.choices.pop())
-            options_data["choices"] = [c.strip() for c in st.session_state.choices if c.strip()]
-        elif poll_type == "Matrix":
-            if "matrix_items" not in st.session_state: st.session_state.matrix_items = ["Topic A"]
-            if "matrix_criteria" not in st.session_state: st.session_state.matrix_criteria = [{"label": "Wider TAM?", "type": "Yes/No", "options": ""}]
-            st.write("**Topics to Rate**")
-            for i, item in enumerate(st.session_state.matrix_items): st.session_state.matrix_items[i] = st.text_input(f"Topic {i+1}", item, key=f"item_{i}")
-            c1, c2 = st.columns(2); c1.button("Add Topic", on_click=lambda: st.session_state.matrix_items.append("")); c2.button("Remove Last Topic", on_click=lambda: st.session_state.matrix_items.pop())
-            st.write("**Criteria**")
-            for i, crit in enumerate(st.session_state.matrix_criteria):
-                c1, c2 = st.columns([2, 1])
-                crit["label"] = c1.text_input(f"Criterion {i+1}", crit["label"], key=f"crit_label_{i}")
-                crit["type"] = c2.selectbox("Type", ["Yes/No", "Scale (1-5)", "Text", "Custom Select"], key=f"crit_type_{i}", index=["Yes/No", "Scale (1-5)", "Text", "Custom Select"].index(crit.get("type", "Yes/No")))
-                if crit["type"] == "Custom Select": crit["options"] = st.text_input("Options (comma-separated)", crit.get("options", ""), key=f"crit_opts_{i}")
-            c1, c2 = st.columns(2); c1.button("Add Criterion", on_click=lambda: st.session_state.matrix_criteria.append({"label": "", "type": "Yes/No", "options": ""})); c2.button("Remove Last Criterion", on_click=lambda: st.session_state.matrix_criteria.pop())
-            options_data["items"] = [i.strip() for i in st.session_state.matrix_items if i.strip()]
-            options_data["criteria"] = [{"label": c["label"].strip(), "type": c["type"], "options": [o.strip() for o in c.get("options", "").split(',') if o.strip()]} for c in st.session_state.matrix_criteria if c["label"].strip()]
-        if st.button("Create & Post", type="primary", disabled=not all([webhook_url, base_url, question, options_data])):
-            pid = create_poll(poll_type.lower().replace(" ", "_"), question, options_data)
-            post_poll_to_slack(webhook_url, base_url, pid, get_poll(pid)); st.success(f"Poll posted!")
-    if st.button("🔄 Refresh Data"): st.rerun()
+        render_create_poll(webhook_url, base_url)
+    pending = list_pending_summaries()
+    # one page of polls per rerun; fetching one extra row tells us whether an older page exists
+    page = st.session_state.get("poll_page", 0)
+    polls = list_polls_meta(POLLS_PAGE_SIZE + 1, page * POLLS_PAGE_SIZE)
+    has_older, polls = len(polls) > POLLS_PAGE_SIZE, polls[:POLLS_PAGE_SIZE]
+    if page and not polls:
+        st.session_state.poll_page = page - 1; st.rerun()
+    c1, c2 = st.columns(2)
+    if c1.button("🔄 Refresh Data"): st.rerun()
+    if c2.button(f"✨ Summarize All Closed Polls ({len(pending)})", disabled=not (pending and st.session_state.get('openai_api_key'))):
+        with st.spinner(f"Generating {len(pending)} AI summaries..."):
+            votes_by_poll = get_votes_for_polls([p['id'] for p in pending if p['poll_type'] != 'single_choice'])
+            for p in pending:
+                if p['poll_type'] != 'single_choice': p['votes_log'] = votes_by_poll.get(p['id'], [])
+            for p, summary in zip(pending, generate_summaries(pending, st.session_state.openai_api_key)):
+                update_summary(p['id'], summary)
+        st.rerun()
     st.markdown("---")
-    for p in list_polls():
+    for p in polls:
         with st.container(border=True):
             status = '🔒 Closed' if p['closed'] else '🟢 Open'
-            st.markdown(f"**{p['question']}** (`{p['poll_type'].replace('_', ' ').title()}`)\n\n`{p['id']}` | **Votes: {len(p['votes_log'])}** | Status: **{status}**")
+            st.markdown(f"**{p['question']}** (`{p['poll_type'].replace('_', ' ').title()}`)\n\n`{p['id']}` | **Votes: {p['vote_count']}** | Status: **{status}**")
             results_tab, summary_tab = st.tabs(["📊 Results", "✨ AI Summary"])
             with results_tab:
-                if not p["votes_log"]: st.info("No votes have been cast yet.")
+                if not p["vote_count"]: st.info("No votes have been cast yet.")
                 else:
                     if p['poll_type'] == 'single_choice': display_single_choice_results(p)
-                    elif p['poll_type'] == 'ranked_preference': display_ranked_results(p)
-                    elif p['poll_type'] == 'matrix': display_matrix_results(p)
+                    # ranked/matrix results need every vote, so they are only loaded once asked for
+                    elif st.toggle("Show results", key=f"show_{p['id']}"):
+                        if p['poll_type'] == 'ranked_preference': display_ranked_results(p, get_votes(p['id']))
+                        elif p['poll_type'] == 'matrix': display_matrix_results(p, get_votes(p['id']))
                 st.markdown("---")
                 if not p['closed']:
                     if st.button("End poll", key=f"end_{p['id']}"): end_poll(p['id']); st.rerun()
@@ -328,10 +675,15 @@ def render_dashboard():
                             else: st.error(f"Failed to post to Slack: {resp.text}")
                     elif st.button("Generate Summary", key=f"sum_{p['id']}", disabled=not st.session_state.get('openai_api_key')):
                         with st.spinner("Generating AI summary..."):
-                            summary = generate_summary(p, st.session_state.openai_api_key)
+                            if p['poll_type'] != 'single_choice': p['votes_log'] = get_votes(p['id'])
+                            summary = generate_summaries([p], st.session_state.openai_api_key)[0]
                             update_summary(p['id'], summary); st.rerun()
                 else:
                     st.info("Please end the poll before generating an AI summary.")
+    if page or has_older:
+        c1, c2 = st.columns(2)
+        c1.button("← Newer polls", disabled=not page, on_click=lambda: st.session_state.update(poll_page=page - 1))
+        c2.button("Older polls →", disabled=not has_older, on_click=lambda: st.session_state.update(poll_page=page + 1))
 
 # --------------------------------- MAIN --------------------------------------- #
 init_db()